@@ -0,0 +1,43 @@
+"""Funkcje wywoływane dla każdego wpisu feedu.
+
+Moduł można skompilować mypyc (``python setup.py build_ext --inplace``);
+bez kompilacji działa jako zwykły Python, więc skrypt nie wymaga buildu.
+"""
+from datetime import datetime, timezone
+from hash_utils import fnv64  # type: ignore[import-untyped]
+
+# Źródła obrazka w kolejności preferencji
+_IMG_SOURCES = ("enclosures", "media_content", "media_thumbnail")
+_HTTP_PREFIXES = ("http://", "https://")
+
+def normalize_guid(entry: dict) -> str:
+    """Tworzy unikalny identyfikator dla każdego wpisu."""
+    guid: str = entry.get("id") or entry.get("link") or ""
+    if not guid:
+        base = f"{entry.get('title','')}-{entry.get('link','')}"
+        # fnv64 zwraca int ze znakiem – maska daje stałe 16 znaków hex
+        guid = format(fnv64(base) & 0xFFFFFFFFFFFFFFFF, "016x")
+    return guid
+
+def entry_datetime(entry: dict, now: datetime) -> datetime:
+    """Pobiera datę publikacji (lub ``now``, jeśli brak) w strefie ``now``."""
+    published = entry.get("published") or entry.get("updated")
+    if published:
+        dt = datetime.fromisoformat(published)
+        # Data bez strefy to UTC – astimezone() uznałby ją za czas lokalny hosta
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        dt = dt.astimezone(now.tzinfo)
+    else:
+        dt = now
+    return dt
+
+def extract_image(entry: dict, fallback: str) -> str:
+    """Wybiera URL obrazka (enclosure, media, thumbnail lub fallback)."""
+    for key in _IMG_SOURCES:
+        sources = entry.get(key)
+        if sources:
+            url = sources[0].get("url")
+            if url and url.startswith(_HTTP_PREFIXES):
+                return url
+    return fallback
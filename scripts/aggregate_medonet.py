@@ -1,13 +1,20 @@
+import os
 import sys
-import time
-import hashlib
-import feedparser
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta, timezone
+import json
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from operator import attrgetter
+import fastfeedparser as feedparser
+from xml.sax.saxutils import XMLGenerator
+from datetime import datetime, timedelta
 from dateutil import tz
+from hash_utils import fnv64
+from _hotpath import normalize_guid, entry_datetime, extract_image
 
 # ==== KONFIGURACJA ====
 OUTPUT_FILE = "docs/medonet.xml"             # gdzie zapisujemy wynikowy plik
+CACHE_FILE = "docs/.feed_cache.json"         # ETag/Last-Modified i wpisy z ostatniego pobrania
 RETENTION_DAYS = 14                          # ile dni trzymamy wpisy
 FALLBACK_IMAGE = "https://sm-cdn.eu/y37kjgxdy0ufdyjt.jpg"  # domyślny obrazek
 
@@ -19,116 +26,164 @@ FEEDS = [
 ]
 
 USER_AGENT = "medonetRSS/1.0 (+https://github.com/arkadiuszgondek/medonetRSS)"
+REQUEST_TIMEOUT = 10                         # sekundy na połączenie/odpowiedź feedu
 TIMEZONE_PL = tz.gettz("Europe/Warsaw")
+RFC822_FORMAT = "%a, %d %b %Y %H:%M:%S %z"   # format dat w RSS 2.0
+ENCLOSURE_ATTRS = {"length": "0", "type": "image/jpeg"}  # stałe atrybuty enclosure
+
+# Wspólna sesja: keep-alive i pula połączeń; gzip/deflate requests negocjuje domyślnie
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": USER_AGENT})
+
+# ==== MODEL ====
+
+@dataclass(slots=True)
+class Item:
+    """Pojedynczy wpis wynikowego RSS."""
+    guid: str
+    title: str
+    link: str
+    description: str
+    pubDate: datetime
+    pubDate_str: str
+    label: str
+    image: str
 
 # ==== FUNKCJE POMOCNICZE ====
 
-def normalize_guid(entry):
-    """Tworzy unikalny identyfikator dla każdego wpisu."""
-    guid = getattr(entry, "id", None) or entry.get("guid") or entry.get("link")
-    if not guid:
-        base = f"{entry.get('title','')}-{entry.get('link','')}"
-        guid = hashlib.sha1(base.encode("utf-8")).hexdigest()
-    return guid
-
-def entry_datetime(entry):
-    """Pobiera datę publikacji (lub aktualną, jeśli brak)."""
-    tm = entry.get("published_parsed") or entry.get("updated_parsed")
-    if tm:
-        dt = datetime.fromtimestamp(time.mktime(tm), tz=timezone.utc).astimezone(TIMEZONE_PL)
-    else:
-        dt = datetime.now(TIMEZONE_PL)
-    return dt
-
-def fetch_feed(url):
-    """Pobiera i parsuje RSS."""
-    feedparser.USER_AGENT = USER_AGENT
-    return feedparser.parse(url)
-
-def extract_image(entry):
-    """Wybiera URL obrazka (enclosure, media, thumbnail lub fallback)."""
-    url = None
-    if "enclosures" in entry and entry.enclosures:
-        url = entry.enclosures[0].get("url")
-    elif "media_content" in entry and entry.media_content:
-        url = entry.media_content[0].get("url")
-    elif "media_thumbnail" in entry and entry.media_thumbnail:
-        url = entry.media_thumbnail[0].get("url")
-
-    if not url or not url.startswith("http"):
-        url = FALLBACK_IMAGE
-    return url
+def load_cache():
+    """Wczytuje cache feedów (pusty, jeśli brak pliku lub jest uszkodzony)."""
+    try:
+        with open(CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def fetch_feed(url, cached):
+    """Pobiera i parsuje RSS warunkowo (ETag/Last-Modified).
+
+    Zwraca (wpisy, rekord cache); przy 304 wpisy pochodzą z cache,
+    a gdy feed jest niedostępny lub uszkodzony – (None, dotychczasowy rekord).
+    """
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    try:
+        resp = SESSION.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+        if resp.status_code == 304 and cached:
+            return cached["entries"], cached
+        resp.raise_for_status()
+        parsed = feedparser.parse(resp.content, include_tags=False)
+    except (requests.RequestException, ValueError):
+        return None, cached
+    # description jest już zbudowany (także z content:encoded) – surowy content
+    # tylko powiększałby cache
+    for e in parsed.entries:
+        e.pop("content", None)
+    return parsed.entries, {
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "entries": parsed.entries,
+    }
+
+def write_element(xml, tag, text="", attrs=None):
+    """Zapisuje pojedynczy element z tekstem (pusty, jeśli brak tekstu)."""
+    xml.startElement(tag, attrs or {})
+    if text:
+        xml.characters(text)
+    xml.endElement(tag)
 
 # ==== POBIERANIE I AGREGACJA ====
 
+# Jeden odczyt zegara na przebieg: daty bez publikacji, retencja i lastBuildDate
+NOW = datetime.now(TIMEZONE_PL)
+CUTOFF = NOW - timedelta(days=RETENTION_DAYS)
+
 items = []
-seen = set()
+seen = set()                                 # 64-bit odciski FNV-1a guidów
+cache = load_cache()
+
+# Pobieranie równolegle (I/O), agregacja i deduplikacja sekwencyjnie
+with ThreadPoolExecutor(max_workers=len(FEEDS)) as pool:
+    results = list(pool.map(lambda url: fetch_feed(url, cache.get(url)), [url for url, _ in FEEDS]))
 
-for url, label in FEEDS:
-    parsed = fetch_feed(url)
-    if parsed.bozo:
+for (url, label), (entries, record) in zip(FEEDS, results):
+    if record:
+        cache[url] = record
+    if entries is None:
         sys.stderr.write(f"[WARN] Problem z feedem: {url}\n")
+        continue
 
-    for e in parsed.entries:
+    for e in entries:
         guid = normalize_guid(e)
-        if guid in seen:
+        guid_hash = fnv64(guid)
+        if guid_hash in seen:
+            continue
+
+        # Retencja od razu – starsze wpisy nie przechodzą dalszej normalizacji
+        pub_dt = entry_datetime(e, NOW)
+        if pub_dt < CUTOFF:
             continue
-        seen.add(guid)
-
-        pub_dt = entry_datetime(e)
-        img_url = extract_image(e)
-
-        items.append({
-            "guid": guid,
-            "title": e.get("title", "").strip(),
-            "link": e.get("link", "").strip(),
-            "description": e.get("description", e.get("summary", "")).strip(),
-            "pubDate": pub_dt,
-            "label": label,
-            "image": img_url
-        })
-
-# ==== FILTR RETENCJI I SORTOWANIE ====
-
-cutoff = datetime.now(TIMEZONE_PL) - timedelta(days=RETENTION_DAYS)
-items = [it for it in items if it["pubDate"] >= cutoff]
-items.sort(key=lambda x: x["pubDate"], reverse=True)
-
-# ==== BUDOWA RSS 2.0 ====
-
-rss = ET.Element("rss", attrib={"version": "2.0"})
-channel = ET.SubElement(rss, "channel")
-ET.SubElement(channel, "title").text = "medonetRSS – agregat (ogólny, dziecko, uroda, żywienie)"
-ET.SubElement(channel, "link").text = "https://www.medonet.pl/"
-ET.SubElement(channel, "description").text = "Zbiorczy RSS z wybranych sekcji Medonetu. Retencja: 14 dni."
-ET.SubElement(channel, "language").text = "pl-PL"
-ET.SubElement(channel, "lastBuildDate").text = datetime.now(TIMEZONE_PL).strftime("%a, %d %b %Y %H:%M:%S %z")
-
-for it in items:
-    item = ET.SubElement(channel, "item")
-    ET.SubElement(item, "title").text = it["title"] or "(bez tytułu)"
-    ET.SubElement(item, "link").text = it["link"]
-
-    desc = ET.SubElement(item, "description")
-    desc.text = it["description"]
-
-    ET.SubElement(item, "guid").text = it["guid"]
-    ET.SubElement(item, "pubDate").text = it["pubDate"].strftime("%a, %d %b %Y %H:%M:%S %z")
-    ET.SubElement(item, "category").text = it["label"]
-
-    # Klasyczny enclosure (RSS 2.0, zgodny z SalesManago)
-    ET.SubElement(item, "enclosure", attrib={
-        "url": it["image"],
-        "length": "0",
-        "type": "image/jpeg"
-    })
-
-# ==== ZAPIS Z DEKLARACJĄ XML DOKŁADNIE WYMUSZONĄ ====
-xml_body = ET.tostring(rss, encoding="utf-8", method="xml").decode("utf-8")
-xml_body = xml_body.lstrip()  # usuń spacje przed <rss>
-declaration = '<?xml version="1.0" encoding="UTF-8"?>\n'
-
-with open(OUTPUT_FILE, "w", encoding="utf-8", newline="\n") as f:
-    f.write(declaration + xml_body)
+        seen.add(guid_hash)
+
+        img_url = extract_image(e, FALLBACK_IMAGE)
+
+        items.append(Item(
+            guid=guid,
+            title=e.get("title", "").strip(),
+            link=e.get("link", "").strip(),
+            description=e.get("description", e.get("summary", "")).strip(),
+            pubDate=pub_dt,
+            pubDate_str=pub_dt.strftime(RFC822_FORMAT),
+            label=label,
+            image=img_url,
+        ))
+
+with open(CACHE_FILE, "w", encoding="utf-8") as f:
+    json.dump(cache, f, ensure_ascii=False)
+
+# ==== SORTOWANIE ====
+
+items.sort(key=attrgetter("pubDate"), reverse=True)
+
+# ==== BUDOWA I ZAPIS RSS 2.0 (STRUMIENIOWO) ====
+# XMLGenerator sam zapisuje deklarację <?xml version="1.0" encoding="UTF-8"?>
+# Zapis do pliku tymczasowego i os.replace – czytelnik widzi stary albo pełny plik
+
+tmp_file = OUTPUT_FILE + ".tmp"
+with open(tmp_file, "wb") as f:
+    xml = XMLGenerator(f, "UTF-8", short_empty_elements=True)
+    xml.startDocument()
+    xml.startElement("rss", {"version": "2.0"})
+    xml.startElement("channel", {})
+    for tag, text in (
+        ("title", "medonetRSS – agregat (ogólny, dziecko, uroda, żywienie)"),
+        ("link", "https://www.medonet.pl/"),
+        ("description", "Zbiorczy RSS z wybranych sekcji Medonetu. Retencja: 14 dni."),
+        ("language", "pl-PL"),
+        ("lastBuildDate", NOW.strftime(RFC822_FORMAT)),
+    ):
+        write_element(xml, tag, text)
+
+    for it in items:
+        xml.startElement("item", {})
+        write_element(xml, "title", it.title or "(bez tytułu)")
+        write_element(xml, "link", it.link)
+        write_element(xml, "description", it.description)
+        write_element(xml, "guid", it.guid)
+        write_element(xml, "pubDate", it.pubDate_str)
+        write_element(xml, "category", it.label)
+
+        # Klasyczny enclosure (RSS 2.0, zgodny z SalesManago)
+        write_element(xml, "enclosure", attrs={"url": it.image, **ENCLOSURE_ATTRS})
+        xml.endElement("item")
+
+    xml.endElement("channel")
+    xml.endElement("rss")
+    xml.endDocument()
+os.replace(tmp_file, OUTPUT_FILE)
 
 print(f"✅ OK: zapisano {OUTPUT_FILE} (pozycje: {len(items)}) z poprawną deklaracją XML i bez media:content")
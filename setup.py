@@ -0,0 +1,13 @@
+"""Opcjonalna kompilacja scripts/_hotpath.py przez mypyc.
+
+    pip install mypy
+    python setup.py build_ext --inplace
+"""
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="medonetRSS-hotpath",
+    package_dir={"": "scripts"},  # .so obok aggregate_medonet.py
+    ext_modules=mypycify(["scripts/_hotpath.py"]),
+)